@@ -87,6 +87,8 @@ app_license = "mit"
 
 # before_install = "crm_overrides.install.before_install"
 # after_install = "crm_overrides.install.after_install"
+# migration patches update CRM Fields Layout without firing doc events
+after_migrate = "crm_overrides.overrides.fields_layout.clear_fields_layout_cache"
 
 # Uninstallation
 # ------------
@@ -145,13 +147,30 @@ override_whitelisted_methods = {
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"CRM Fields Layout": {
+		"on_update": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+		"on_trash": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+	},
+	"DocType": {
+		"on_update": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+	},
+	"Custom Field": {
+		"on_update": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+		"on_trash": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+	},
+	"Property Setter": {
+		"on_update": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+		"on_trash": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+	},
+	"Custom DocPerm": {
+		"on_update": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+		"on_trash": "crm_overrides.overrides.fields_layout.clear_fields_layout_cache",
+	},
+}
+
+# `bench clear-cache` also drops the layout caches, e.g. after raw SQL or set_value fixes
+clear_cache = "crm_overrides.overrides.fields_layout.clear_fields_layout_cache"
 
 # Scheduled Tasks
 # ---------------
@@ -218,12 +237,12 @@ website_route_rules = [
 
 # Request Events
 # ----------------
-# before_request = ["crm_overrides.utils.before_request"]
+before_request = ["crm_overrides.overrides.fields_layout.patch_get_fields_layout"]
 # after_request = ["crm_overrides.utils.after_request"]
 
 # Job Events
 # ----------
-# before_job = ["crm_overrides.utils.before_job"]
+before_job = ["crm_overrides.overrides.fields_layout.patch_get_fields_layout"]
 # after_job = ["crm_overrides.utils.after_job"]
 
 # User Data Protection
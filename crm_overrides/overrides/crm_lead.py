@@ -1,10 +1,11 @@
-from crm.fcrm.doctype.crm_lead.crm_lead import CRMLead
+import marshal
 
+from crm.fcrm.doctype.crm_lead.crm_lead import CRMLead
 
-class CustomCRMLead(CRMLead):
-	@staticmethod
-	def default_list_data():
-		columns = [
+# marshalled once so each call gets a fresh copy that list views can mutate
+_DEFAULT_LIST_DATA = marshal.dumps(
+	{
+		"columns": [
 			{
 				"label": "Test 1",
 				"type": "Data",
@@ -48,8 +49,8 @@ class CustomCRMLead(CRMLead):
 				"key": "modified",
 				"width": "8rem",
 			},
-		]
-		rows = [
+		],
+		"rows": [
 			"name",
 			"lead_name",
 			"organization",
@@ -65,5 +66,12 @@ class CustomCRMLead(CRMLead):
 			"modified",
 			"_assign",
 			"image",
-		]
-		return {"columns": columns, "rows": rows}
+		],
+	}
+)
+
+
+class CustomCRMLead(CRMLead):
+	@staticmethod
+	def default_list_data():
+		return marshal.loads(_DEFAULT_LIST_DATA)
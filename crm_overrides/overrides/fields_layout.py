@@ -1,87 +1,137 @@
-import frappe
+import copy
+import hashlib
 import json
+
+import frappe
+from crm.fcrm.doctype.crm_fields_layout import crm_fields_layout
+from crm.fcrm.doctype.crm_fields_layout.crm_fields_layout import (
+	get_default_layout,
+	handle_perm_level_restrictions,
+)
 from frappe.utils import random_string
 
+FIELDS_LAYOUT_CACHE_KEY = "crm_fields_layout"
+DEFAULT_FIELDS_LAYOUT_CACHE_KEY = "crm_default_fields_layout"
+
+# DocField properties read by the frontend field layout components
+LAYOUT_FIELD_KEYS = (
+	"fieldname",
+	"label",
+	"fieldtype",
+	"options",
+	"reqd",
+	"read_only",
+	"hidden",
+	"depends_on",
+	"mandatory_depends_on",
+	"read_only_depends_on",
+	"default",
+	"description",
+	"placeholder",
+	"link_filters",
+	"permlevel",
+	"precision",
+	"length",
+	"non_negative",
+)
+
 
 @frappe.whitelist()
 def get_fields_layout(doctype: str, type: str, parent_doctype: str | None = None):
 	"""Override to customize the Data Fields layout - replace annual_revenue with deal_value for CRM Deal"""
-	from crm.fcrm.doctype.crm_fields_layout.crm_fields_layout import (
-		get_default_layout,
-		handle_perm_level_restrictions,
+	# perm level restrictions depend on the session user's roles, so they are part of the key;
+	# meta.modified covers doctype changes synced without triggering doc events (e.g. migrate),
+	# child table restrictions come from the parent doctype's permissions
+	roles = hashlib.md5("|".join(sorted(frappe.get_roles())).encode()).hexdigest()
+	modified = frappe.get_meta(doctype).modified
+	if parent_doctype:
+		modified = f"{modified}|{frappe.get_meta(parent_doctype).modified}"
+	key = f"{doctype}|{type}|{parent_doctype}|{modified}|{roles}"
+	tabs = frappe.cache().hget(
+		FIELDS_LAYOUT_CACHE_KEY,
+		key,
+		generator=lambda: _get_fields_layout(doctype, type, parent_doctype),
 	)
-	
-	tabs = []
-	layout = None
+	# callers may mutate the layout, never hand out the cached object itself
+	return copy.deepcopy(tabs)
 
-	if frappe.db.exists("CRM Fields Layout", {"dt": doctype, "type": type}):
-		layout = frappe.get_doc("CRM Fields Layout", {"dt": doctype, "type": type})
 
-	if layout and layout.layout:
-		tabs = json.loads(layout.layout)
+def patch_get_fields_layout():
+	"""Point crm's get_fields_layout at this override for direct Python callers too"""
+	# hooked before every request and job, only the first call in a worker rebinds
+	if crm_fields_layout.get_fields_layout is not get_fields_layout:
+		crm_fields_layout.get_fields_layout = get_fields_layout
 
-	if not tabs and type != "Required Fields":
-		tabs = get_default_layout(doctype)
 
-	has_tabs = False
-	if isinstance(tabs, list) and len(tabs) > 0 and isinstance(tabs[0], dict):
-		has_tabs = any("sections" in tab for tab in tabs)
+def clear_fields_layout_cache(doc=None, method=None):
+	frappe.cache().delete_key(FIELDS_LAYOUT_CACHE_KEY)
+	frappe.cache().delete_key(DEFAULT_FIELDS_LAYOUT_CACHE_KEY)
 
-	if not has_tabs:
-		tabs = [{"name": "first_tab", "sections": tabs}]
 
+def _get_fields_layout(doctype: str, type: str, parent_doctype: str | None = None):
+	layout = frappe.db.get_value("CRM Fields Layout", {"dt": doctype, "type": type}, "layout")
 	# CUSTOM OVERRIDE: Replace annual_revenue with deal_value BEFORE processing
-	if doctype == "CRM Deal" and type == "Data Fields":
-		for tab in tabs:
-			for section in tab.get("sections", []):
-				for column in section.get("columns", []):
-					field_list = column.get("fields", [])
-					for i, field in enumerate(field_list):
-						if field == "annual_revenue":
-							field_list[i] = "deal_value"
-
-	allowed_fields = []
-	for tab in tabs:
-		for section in tab.get("sections"):
-			if "columns" not in section:
-				continue
-			for column in section.get("columns"):
-				if not column.get("fields"):
-					continue
-				allowed_fields.extend(column.get("fields"))
+	replace_annual_revenue = doctype == "CRM Deal" and type == "Data Fields"
+	if layout and replace_annual_revenue:
+		layout = layout.replace('"annual_revenue"', '"deal_value"')
 
-	fields = frappe.get_meta(doctype).fields
-	fields = [field for field in fields if field.fieldname in allowed_fields]
+	tabs = json.loads(layout) if layout else []
 
-	required_fields = []
+	meta = frappe.get_meta(doctype)
+	required_fields = {}
 
 	if type == "Required Fields":
-		required_fields = [
-			field for field in frappe.get_meta(doctype, False).fields if field.reqd and not field.default
-		]
+		required_fields = {
+			field.fieldname: field for field in meta.fields if field.reqd and not field.default
+		}
+		# no stored layout and nothing required: return the empty tab the layout editor builds on
+		if not tabs and not required_fields:
+			return [{"name": "first_tab", "sections": []}]
+
+	is_default_layout = False
+	if not tabs and type != "Required Fields":
+		tabs = _get_default_layout(meta)
+		is_default_layout = True
 
-	for tab in tabs:
-		for section in tab.get("sections"):
-			if section.get("columns"):
-				section["columns"] = [column for column in section.get("columns") if column]
-			for column in section.get("columns") if section.get("columns") else []:
-				column["fields"] = [field for field in column.get("fields") if field]
-				for field in column.get("fields") if column.get("fields") else []:
-					field = next((f for f in fields if f.fieldname == field), None)
-					if field:
-						field = field.as_dict()
-						handle_perm_level_restrictions(field, doctype, parent_doctype)
-						column["fields"][column.get("fields").index(field["fieldname"])] = field
-
-						# remove field from required_fields if it is already present
-						if (
-							type == "Required Fields"
-							and field.reqd
-							and any(f.get("fieldname") == field.get("fieldname") for f in required_fields)
-						):
-							required_fields = [
-								f for f in required_fields if f.get("fieldname") != field.get("fieldname")
-							]
+	has_tabs = False
+	if isinstance(tabs, list) and len(tabs) > 0 and isinstance(tabs[0], dict):
+		has_tabs = any("sections" in tab for tab in tabs)
+
+	if not has_tabs:
+		tabs = [{"name": "first_tab", "sections": tabs}]
+
+	# the default layout already lists deal_value, so annual_revenue is dropped instead of renamed
+	if is_default_layout and replace_annual_revenue:
+		for column in _iter_columns(tabs):
+			column["fields"] = [field for field in column.get("fields") or [] if field != "annual_revenue"]
+
+	slots = list(_iter_field_slots(tabs))
+	allowed_fields = {fieldname for _, _, fieldname in slots}
+
+	# Meta.get_field looks fields up in its own fieldname index
+	fields_by_name = {fieldname: meta.get_field(fieldname) for fieldname in allowed_fields}
+
+	# for a given doctype and user, handle_perm_level_restrictions only reads permlevel and only
+	# sets read_only/hidden; run it on the first field of each group and replay its outcome
+	perm_restrictions = {}
+	for field_list, idx, fieldname in slots:
+		field = fields_by_name.get(fieldname)
+		if not field:
+			continue
+
+		field = _as_layout_field(field)
+		perm_key = (field.permlevel, field.read_only, field.hidden)
+		restrictions = perm_restrictions.get(perm_key)
+		if restrictions is None:
+			handle_perm_level_restrictions(field, doctype, parent_doctype)
+			perm_restrictions[perm_key] = (field.read_only, field.hidden)
+		else:
+			field.read_only, field.hidden = restrictions
+		field_list[idx] = field
+
+		# remove field from required_fields if it is already present
+		if field.reqd:
+			required_fields.pop(field.fieldname, None)
 
 	if type == "Required Fields" and required_fields and tabs:
 		tabs[-1].get("sections").append(
@@ -93,10 +143,44 @@ def get_fields_layout(doctype: str, type: str, parent_doctype: str | None = None
 				"columns": [
 					{
 						"name": "required_fields_column_" + str(random_string(4)),
-						"fields": [field.as_dict() for field in required_fields],
+						"fields": [_as_layout_field(field) for field in required_fields.values()],
 					}
 				],
 			}
 		)
 
 	return tabs or []
+
+
+def _iter_columns(tabs: list):
+	"""Yield every column of `tabs`, dropping empty columns from their section"""
+	for tab in tabs:
+		for section in tab.get("sections") or ():
+			columns = section.get("columns")
+			if not columns:
+				continue
+			section["columns"] = columns = [column for column in columns if column]
+			yield from columns
+
+
+def _iter_field_slots(tabs: list):
+	"""Yield (field_list, index, fieldname) for every field of `tabs`, dropping empty entries"""
+	for column in _iter_columns(tabs):
+		field_list = [field for field in column.get("fields") or [] if field]
+		column["fields"] = field_list
+		for idx, fieldname in enumerate(field_list):
+			yield field_list, idx, fieldname
+
+
+def _get_default_layout(meta):
+	# versioned like the resolved layout, so doctype syncs without doc events miss the cache
+	key = f"{meta.name}|{meta.modified}"
+	tabs = frappe.cache().hget(
+		DEFAULT_FIELDS_LAYOUT_CACHE_KEY, key, generator=lambda: get_default_layout(meta.name)
+	)
+	# the layout is mutated in place while resolving fields
+	return copy.deepcopy(tabs)
+
+
+def _as_layout_field(field):
+	return frappe._dict({key: field.get(key) for key in LAYOUT_FIELD_KEYS})